@@ -1,10 +1,19 @@
 #!/usr/bin/env python3
+import asyncio
+import heapq
 import os
 import secrets
+import threading
+import time
 import httpx
+from cachetools import TTLCache
+import orjson
 from datetime import datetime,timezone, timedelta
-import re 
+import re
 from html import unescape
+from urllib.parse import parse_qs, urlencode, urlsplit, urlunsplit
+from itertools import islice
+from operator import itemgetter
 from typing import Any
 from fastmcp import FastMCP
 from fastmcp.server.dependencies import get_http_request
@@ -19,10 +28,16 @@ poke_api_key = os.getenv("POKE_API_KEY")
 if not poke_api_key:
     raise RuntimeError("POKE_API_KEY is required. Set it in your environment to secure this MCP server.")
 
+# built once; every Canvas call shares this via the pooled client
+_AUTH_HEADERS = {"Authorization": f"Bearer {access_token}"}
+
 class ApiKeyMiddleware(Middleware):
     def __init__(self, api_key: str, header_name: str = "x-api-key"):
         self.api_key = api_key
         self.header_name = header_name
+        # encoded once here; compare_digest on bytes skips the per-request
+        # encode of the expected key
+        self._expected = api_key.encode()
 
     async def on_message(self, context: MiddlewareContext, call_next: CallNext):
         request = get_http_request()
@@ -30,20 +45,119 @@ class ApiKeyMiddleware(Middleware):
 
         if not provided:
             auth = request.headers.get("authorization")
-            if auth and auth.lower().startswith("bearer "):
+            # only the scheme is case-insensitive; lowercase those 7 chars
+            # instead of copying the whole header (the token can be long)
+            if auth and auth[:7].lower() == "bearer ":
                 provided = auth[7:].strip()
 
-        if not provided or not secrets.compare_digest(provided, self.api_key):
+        if not provided or not secrets.compare_digest(provided.encode(), self._expected):
             raise PermissionError("Missing or invalid API key.")
 
         return await call_next(context)
 
-mcp = FastMCP("poke-canvas-mcp", middleware=[ApiKeyMiddleware(poke_api_key)])
-
-def canvas_get(path : str, params : dict | None = None):
-    url = base_url + path
-    headers = {"Authorization" : f"Bearer {access_token}"}
-    r = httpx.get(url, headers=headers, params=params, timeout=90.0)
+# FastMCP serializes non-string tool results with stdlib json by default;
+# orjson cuts that encoding cost on the larger summary payloads
+def _serialize_tool_result(data: Any) -> str:
+    # OPT_NON_STR_KEYS matches stdlib json's coercion of int dict keys, so the
+    # swap can't start raising on payload shapes that used to serialize fine
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode()
+
+mcp = FastMCP("poke-canvas-mcp", middleware=[ApiKeyMiddleware(poke_api_key)], tool_serializer=_serialize_tool_result)
+
+# one shared client so every Canvas call reuses pooled connections
+_client: httpx.AsyncClient | None = None
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            base_url=base_url,
+            headers=_AUTH_HEADERS,
+            http2=True,
+            timeout=90.0,
+            # hold idle connections long enough to span poke's multi-tool bursts
+            limits=httpx.Limits(max_keepalive_connections=20, keepalive_expiry=30.0),
+        )
+    return _client
+
+# orjson decodes the raw bytes a few times faster than httpx's stdlib-json path,
+# which matters on the big planner/assignments payloads
+def _json(r: httpx.Response):
+    return orjson.loads(r.content)
+
+# short-lived response cache so a burst of tool calls (poke often fires several
+# for one question) shares Canvas responses instead of refetching them;
+# MCP_CACHE_TTL=0 disables it
+_CACHE_TTL = float(os.getenv("MCP_CACHE_TTL", "60"))
+_response_cache: TTLCache = TTLCache(maxsize=512, ttl=_CACHE_TTL or 1)
+_response_lock = threading.Lock()
+
+def clear_response_cache():
+    with _response_lock:
+        _response_cache.clear()
+
+# canvas silently truncates list responses at per_page and exposes the rest via
+# Link headers; follow them so >100-item terms aren't dropped, but bound the
+# follow-up so a pathological feed can't fan out forever
+_MAX_PAGES = 10
+
+def _numbered_page_urls(next_url: str, last_url: str) -> list[str] | None:
+    scheme, netloc, p, q, frag = urlsplit(next_url)
+    nq = parse_qs(q)
+    try:
+        first = int(nq.get("page", ["2"])[0])
+        last_page = int(parse_qs(urlsplit(last_url).query).get("page", ["1"])[0])
+    except ValueError:
+        # bookmark-style cursors; caller falls back to walking rel="next"
+        return None
+
+    urls = []
+    for page in range(first, min(last_page, _MAX_PAGES) + 1):
+        nq["page"] = [str(page)]
+        urls.append(urlunsplit((scheme, netloc, p, urlencode(nq, doseq=True), frag)))
+    return urls
+
+async def _follow_pagination(client: httpx.AsyncClient, r: httpx.Response, data: list):
+    next_url = (r.links.get("next") or {}).get("url")
+    if not next_url:
+        return
+
+    last_url = (r.links.get("last") or {}).get("url")
+    page_urls = _numbered_page_urls(next_url, last_url) if last_url else None
+
+    if page_urls is not None:
+        # rel="last" tells us every remaining page, so fetch them all in parallel
+        responses = await asyncio.gather(*[client.get(u) for u in page_urls], return_exceptions=True)
+        for rr in responses:
+            if isinstance(rr, httpx.Response) and rr.status_code < 400:
+                more = _json(rr)
+                if isinstance(more, list):
+                    data.extend(more)
+        return
+
+    # cursor pagination exposes only rel="next"; walk it serially
+    pages = 1
+    url = next_url
+    while url and pages < _MAX_PAGES:
+        rr = await client.get(url)
+        if rr.status_code >= 400:
+            break
+        more = _json(rr)
+        if isinstance(more, list):
+            data.extend(more)
+        url = (rr.links.get("next") or {}).get("url")
+        pages += 1
+
+async def canvas_get(path : str, params : dict | None = None):
+    key = (path, tuple(sorted((params or {}).items())))
+    if _CACHE_TTL > 0:
+        with _response_lock:
+            cached = _response_cache.get(key)
+        if cached is not None:
+            return cached
+
+    client = get_client()
+    r = await client.get(path, params=params)
 
     if r.status_code >= 400:
         return{
@@ -52,298 +166,410 @@ def canvas_get(path : str, params : dict | None = None):
             "error": r.text,
             "url": str(r.url)
         }
-    return {"ok": True, "data":r.json()}
+
+    data = _json(r)
+    if isinstance(data, list):
+        await _follow_pagination(client, r, data)
+
+    result = {"ok": True, "data": data}
+    if _CACHE_TTL > 0:
+        with _response_lock:
+            _response_cache[key] = result
+    return result
+
+# compiled once at import so the announcement loops don't pay regex lookup per body;
+# one alternation handles <br>, </p> and generic tags in a single pass over the html
+_HTML_RE = re.compile(r"(<br\s*/?>)|(</p\s*>)|<[^>]+>", re.I)
+_NL_RE = re.compile(r"\n{3,}")
+
+# canvas bodies overwhelmingly use these few entities; decode them with one small
+# regex and only fall back to html.unescape's full HTML5 table when something
+# else (a bare & or a rarer entity) is left over
+_FAST_ENTITIES = {
+    "&amp;": "&",
+    "&lt;": "<",
+    "&gt;": ">",
+    "&quot;": '"',
+    "&#39;": "'",
+    "&nbsp;": "\xa0",
+}
+_FAST_ENTITY_RE = re.compile("|".join(map(re.escape, _FAST_ENTITIES)))
+
+def _unescape_common(text: str) -> str:
+    decoded = _FAST_ENTITY_RE.sub(lambda m: _FAST_ENTITIES[m.group(0)], text)
+    if "&" in decoded:
+        # decode the original, not the fast-pass output, so entities that encode
+        # other entities (e.g. &amp;lt;) aren't unescaped twice
+        return unescape(text)
+    return decoded
+
+def _tag_replacement(m: re.Match) -> str:
+    # lastindex tells us which alternative matched without lowering/copying the tag
+    if m.lastindex == 1:
+        return "\n"
+    if m.lastindex == 2:
+        return "\n\n"
+    return ""
 
 # the response from announcements endpoint has weird html characters, this helper converts to text and cleans it
 def strip_html(html: str) -> str:
-    text = re.sub(r"<br\s*/?>", "\n", html, flags=re.I)
-    text = re.sub(r"</p\s*>", "\n\n", text, flags=re.I)
-    text = re.sub(r"<[^>]+>", "", text)
-    text = unescape(text)
-    return re.sub(r"\n{3,}", "\n\n", text).strip()
+    # most short announcements carry no markup at all; skip the scans entirely
+    if "<" not in html:
+        text = _unescape_common(html) if "&" in html else html
+        if "\n\n\n" in text:
+            return _NL_RE.sub("\n\n", text).strip()
+        return text.strip()
+
+    text = _HTML_RE.sub(_tag_replacement, html)
+    if "&" in text:
+        text = _unescape_common(text)
+    return _NL_RE.sub("\n\n", text).strip()
 
 def abs_url(url: str | None) -> str | None:
     if not url:
         return url
-    if url.startswith("/"):
+    # single-char index compare beats the startswith method call on this hot path
+    if url[0] == "/":
         return base_url + url
     return url
 
-def fetch_dashboard_cards(term_prefix: str | None = None):
-    url = base_url + "/api/v1/dashboard/dashboard_cards?per_page=100"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    r = httpx.get(url, headers=headers, timeout=90.0)
-    cards = r.json()
-
-    data = []
-    for card in cards:
-        name = card["shortName"]
-        id = card["id"]
-        if term_prefix and not name.startswith(term_prefix):
-            continue
-        data.append({"id": id, "name": name})
+# the dashboard list barely changes (shortNames only move between terms), so it
+# gets a longer TTL than the response cache; the lock also dedupes concurrent
+# fetches for the same prefix
+_CARDS_TTL = 300.0
+_cards_cache: dict[str | None, tuple[float, list]] = {}
+_cards_lock = asyncio.Lock()
+
+async def fetch_dashboard_cards(term_prefix: str | None = None, limit: int | None = None):
+    async with _cards_lock:
+        cached = _cards_cache.get(term_prefix)
+        if cached and time.monotonic() - cached[0] < _CARDS_TTL:
+            data = cached[1]
+        else:
+            r = await get_client().get("/api/v1/dashboard/dashboard_cards", params={"per_page": 100})
+            cards = _json(r)
+
+            data = [
+                {"id": card["id"], "name": card["shortName"]}
+                for card in cards
+                if not term_prefix or card["shortName"].startswith(term_prefix)
+            ]
+
+            _cards_cache[term_prefix] = (time.monotonic(), data)
+
+    # truncate outside the cache so one cached list serves every limit; islice
+    # keeps the cut lazy instead of copying the tail just to throw it away
+    if limit is not None:
+        return list(islice(data, limit))
     return data
 
-def fetch_assignments(course_id: int, days_ahead: int, include_overdue: bool):
+# frozenset hashes once and supports the fastest membership check CPython has;
+# the planner-based tools test every feed item against this
+def _allowed_course_ids(courses: list[dict]) -> frozenset[int]:
+    return frozenset(c["id"] for c in courses)
+
+# one normalized shape for planner items, shared by get_week_ahead and
+# get_today_summary; a dict literal over locally bound getters is the cheapest
+# JSON-serialisable build CPython offers (dataclasses would need converting back)
+_SUBMISSION_KEYS = ("submitted", "graded", "late", "missing", "posted_at", "has_feedback")
+
+def _submission_summary(subs: dict) -> dict[str, Any]:
+    _get = subs.get
+    return {k: _get(k) for k in _SUBMISSION_KEYS}
+
+def _normalize_planner_item(item: dict, plannable: dict, pl_type: str | None, dt_raw: str, subs: dict | None, bu: str) -> dict[str, Any]:
+    _get = item.get
+    u = _get("html_url") or ""
+
+    normalized: dict[str, Any] = {
+        "type": pl_type,
+        "course_id": _get("course_id"),
+        "course_name": _get("context_name"),
+        "id": _get("plannable_id"),
+        "title": plannable.get("title"),
+        "date": dt_raw,
+        "new_activity": _get("new_activity", False),
+        "html_url": bu + u if u and u[0] == "/" else u,
+    }
+
+    if subs is not None:
+        normalized["submission"] = _submission_summary(subs)
+
+    pget = plannable.get
+    if pl_type in ("assignment", "quiz"):
+        normalized["due_at"] = pget("due_at")
+        normalized["points_possible"] = pget("points_possible")
+        normalized["assignment_id"] = pget("assignment_id")
+    elif pl_type == "calendar_event":
+        normalized["start_at"] = pget("start_at")
+        normalized["end_at"] = pget("end_at")
+        normalized["location_name"] = pget("location_name")
+        normalized["online_meeting_url"] = pget("online_meeting_url")
+
+    return normalized
+
+async def fetch_assignments(course_id: int, days_ahead: int, include_overdue: bool, _skip_sort: bool = False):
     now = datetime.now(timezone.utc)
     end = now + timedelta(days=days_ahead)
+    # canvas due_at strings are ISO-8601 UTC, so they compare lexicographically;
+    # the window gates below need no datetime parse per assignment
+    now_iso = now.isoformat(timespec="seconds").replace("+00:00", "Z")
+    end_iso = end.isoformat(timespec="seconds").replace("+00:00", "Z")
 
     params = {"per_page": 100, "include[]": "submission"}
-    r = canvas_get(f"/api/v1/courses/{course_id}/assignments", params)
+    r = await canvas_get(f"/api/v1/courses/{course_id}/assignments", params)
 
     if not r["ok"]:
         return r
 
     assignments = r["data"]
-    results = []
+    # decorate-sort-undecorate: the key tuple is built once per item instead of
+    # once per comparison inside a lambda
+    keyed: list[tuple[tuple[int, str], dict[str, Any]]] = []
+    # locals resolve via LOAD_FAST, worth it inside the per-item loop
+    _append = keyed.append
 
     for assignment in assignments:
         due_at_raw = assignment.get("due_at")
         if not due_at_raw:
             continue
 
-        due = datetime.fromisoformat(due_at_raw.replace("Z", "+00:00"))
-
         submission = assignment.get("submission") or {}
         submitted = submission.get("submitted_at") is not None
 
-        is_overdue = due < now and not submitted
-        is_upcoming = now <= due <= end
+        is_overdue = due_at_raw < now_iso and not submitted
+        is_upcoming = now_iso <= due_at_raw <= end_iso
 
         if is_upcoming or (include_overdue and is_overdue):
-            results.append({
+            _append(((0 if is_overdue else 1, due_at_raw), {
                 "type": "assignment",
                 "course_id": course_id,
                 "id": assignment.get("id"),
                 "name": assignment.get("name"),
-                "due_at": due.isoformat(),
+                # keep the raw ISO string; it sorts the same and skips an isoformat() per item
+                "due_at": due_at_raw,
                 "is_overdue": is_overdue,
                 "submitted": submitted,
                 "points_possible": assignment.get("points_possible"),
                 "html_url": assignment.get("html_url"),
-            })
+            }))
 
-    results.sort(key=lambda assignment: (not assignment["is_overdue"], assignment["due_at"]))
-    return results
+    # aggregators re-sort the merged list anyway, so let them skip this pass
+    if not _skip_sort:
+        keyed.sort(key=itemgetter(0))
+    return [item for _, item in keyed]
 
 @mcp.tool(description="""
 Use when the user asks: 'What classes am I enrolled in?' or 'Show all my courses'.
 Returns Canvas course objects for all enrolled/active courses (raw Canvas response). 
 Best for troubleshooting or listing everything.""")
-def list_courses_raw(_=None):
-    url = base_url+"/api/v1/courses?per_page=100"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    r = httpx.get(url, headers=headers, timeout=90.0)
-    return r.json();
+async def list_courses_raw():
+    r = await canvas_get("/api/v1/courses", params={"per_page": 100})
+    if not r["ok"]:
+        return r
+    return r["data"];
 
 @mcp.tool(description="""
 Use when the user asks: 'What are my current classes this term?' or 'Show my dashboard classes'.
 Returns a lightweight list of active dashboard courses in the user's dashboard order (id + name).
 Supports filtering by term prefix like '26SS' or '26FS'.""")
-def get_dashboard_cards(term_prefix: str | None = None):
-    return fetch_dashboard_cards(term_prefix)
+async def get_dashboard_cards(term_prefix: str | None = None):
+    return await fetch_dashboard_cards(term_prefix)
 
 @mcp.tool(description="""
 Use when the user asks about assignments for ONE specific course (e.g. 'What is due in my Algorithms class?'). 
 Returns upcoming assignments (and optionally overdue) for that course with due date and submission status. 
 If the user wants everything across classes, prefer get_upcoming_assignments.""")
-def get_course_assignments(course_id: int, days_ahead: int, include_overdue: bool):
-    return fetch_assignments(course_id, days_ahead, include_overdue)
+async def get_course_assignments(course_id: int, days_ahead: int, include_overdue: bool):
+    return await fetch_assignments(course_id, days_ahead, include_overdue)
 
 @mcp.tool(description="""
 Use when the user asks: 'What assignments are due soon?' 'What do I have due this week?' or 'Any overdue work?' 
 Returns a single sorted list of upcoming (and optionally overdue) assignments across dashboard courses. 
 Best for deadline-only views (no announcements/grades).""")
-def get_upcoming_assignments(days_ahead: int = 7, include_overdue: bool = False, term_prefix: str | None = None, max_courses: int = 8):
-    courses = fetch_dashboard_cards(term_prefix)
+async def get_upcoming_assignments(days_ahead: int = 7, include_overdue: bool = False, term_prefix: str | None = None, max_courses: int = 8):
+    limit = max_courses if not term_prefix and max_courses and max_courses > 0 else None
+    courses = await fetch_dashboard_cards(term_prefix, limit=limit)
 
-    if not term_prefix and max_courses and max_courses > 0:
-        courses = courses[:max_courses]
+    # fire all per-course fetches at once so latency is one round trip, not N
+    tasks = [fetch_assignments(course["id"], days_ahead, include_overdue, _skip_sort=True) for course in courses]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
 
-    all_assignments = []
+    keyed: list[tuple[tuple[int, str], dict[str, Any]]] = []
 
-    for course in courses:
-        course_id = course["id"]
+    for course, assignments in zip(courses, results):
         course_name = course["name"]
-        assignments = fetch_assignments(course_id, days_ahead, include_overdue)
         if isinstance(assignments, list):
             for assignment in assignments:
                 assignment["course_name"] = course_name
-                all_assignments.append(assignment)
+                keyed.append(((0 if assignment["is_overdue"] else 1, assignment["due_at"]), assignment))
 
-    all_assignments.sort(key=lambda assignment: (not assignment["is_overdue"], assignment["due_at"]))
+    keyed.sort(key=itemgetter(0))
 
-    return all_assignments;
+    return [assignment for _, assignment in keyed];
 
-@mcp.tool(description="""
-Use when the user asks: 'Any new announcements?' 'Did my professor post anything?' or 'Any class updates?' 
-Returns recent Canvas announcements across dashboard courses (title, author, posted time, link). 
-Optionally include the full body text for summarization.""")
-def get_recent_announcements(days_back: int =7, term_prefix: str | None = None, max_courses: int = 8, per_course: int = 5, include_body: bool = False):
-    now = datetime.now(timezone.utc)
-    start =  now - timedelta(days=days_back)
+async def _fetch_announcements_for_course(course: dict, start_iso: str, per_course: int, include_body: bool):
+    course_id = course["id"]
+    course_name = course["name"]
+    params = {
+        "only_announcements" : "true",
+        "per_page" : 50
+    }
 
-    courses = fetch_dashboard_cards(term_prefix)
+    r = await canvas_get(f"/api/v1/courses/{course_id}/discussion_topics", params)
 
-    if not term_prefix and max_courses and max_courses > 0:
-        courses = courses[:max_courses]
-    
-    all_items: list[dict[str, Any]] = []
+    if not r["ok"]:
+        return []
 
-    for course in courses:
-        course_id = course["id"]
-        course_name = course["name"]
-        params = {
-            "only_announcements" : "true",
-            "per_page" : 50
-        }
+    topics = r["data"] or []
 
-        r = canvas_get(f"/api/v1/courses/{course_id}/discussion_topics", params)
+    # select the newest per_course topics on a cheap (timestamp, topic) tuple first,
+    # so the full dict build and strip_html only run for survivors
+    candidates: list[tuple[str, dict]] = []
+    for topic in topics:
+        posted_raw = topic.get("posted_at") or topic.get("created_at")
+        if not posted_raw:
+            continue
 
-        if not r["ok"]:
+        if posted_raw < start_iso:
             continue
 
-        topics = r["data"] or []
-        results_for_course: list[dict[str, Any]] = []
+        candidates.append((posted_raw, topic))
 
-        for topic in topics:
-            posted_raw = topic.get("posted_at") or topic.get("created_at")
-            if not posted_raw:
-                continue
+    newest = heapq.nlargest(per_course, candidates, key=itemgetter(0))
 
-            posted = datetime.fromisoformat(posted_raw.replace("Z", "+00:00"))
-            if posted < start:
-                continue
+    results_for_course: list[dict[str, Any]] = []
+    for posted_iso, topic in newest:
+        item: dict[str, Any] = {
+            "type": "announcement",
+            "course_id": course_id,
+            "course_name": course_name,
+            "id": topic.get("id"),
+            "title": topic.get("title"),
+            "posted_at": posted_iso,
+            "author": (topic.get("author") or {}).get("display_name") or topic.get("user_name"),
+            "read_state": topic.get("read_state"),
+            "unread_count": topic.get("unread_count"),
+            "html_url": abs_url(topic.get("html_url") or topic.get("url")),
+        }
 
-            item: dict[str, Any] = {
-                "type": "announcement",
-                "course_id": course_id,
-                "course_name": course_name,
-                "id": topic.get("id"),
-                "title": topic.get("title"),
-                "posted_at": posted.isoformat(),
-                "author": (topic.get("author") or {}).get("display_name") or topic.get("user_name"),
-                "read_state": topic.get("read_state"),
-                "unread_count": topic.get("unread_count"),
-                "html_url": abs_url(topic.get("html_url") or topic.get("url")),
-            }
+        if include_body:
+            body_html = topic.get("message") or ""
+            item["message_html"] = body_html
+            item["message_text"] = strip_html(body_html) if body_html else ""
 
-            if include_body:
-                body_html = topic.get("message") or ""
-                item["message_html"] = body_html
-                item["message_text"] = strip_html(body_html) if body_html else ""
+        results_for_course.append(item)
+
+    return results_for_course
+
+@mcp.tool(description="""
+Use when the user asks: 'Any new announcements?' 'Did my professor post anything?' or 'Any class updates?'
+Returns recent Canvas announcements across dashboard courses (title, author, posted time, link).
+Optionally include the full body text for summarization.""")
+async def get_recent_announcements(days_back: int =7, term_prefix: str | None = None, max_courses: int = 8, per_course: int = 5, include_body: bool = False):
+    now = datetime.now(timezone.utc)
+    start = now - timedelta(days=days_back)
+    start_iso = start.isoformat(timespec="seconds").replace("+00:00", "Z")
 
-            results_for_course.append(item)
+    limit = max_courses if not term_prefix and max_courses and max_courses > 0 else None
+    courses = await fetch_dashboard_cards(term_prefix, limit=limit)
 
-        results_for_course.sort(key=lambda x: x["posted_at"], reverse=True)
-        all_items.extend(results_for_course[:per_course])
+    # hit every course's discussion_topics endpoint concurrently
+    per_course_lists = await asyncio.gather(
+        *[_fetch_announcements_for_course(course, start_iso, per_course, include_body) for course in courses],
+        return_exceptions=True,
+    )
+
+    all_items: list[dict[str, Any]] = []
+    for items in per_course_lists:
+        if isinstance(items, list):
+            all_items.extend(items)
 
-    all_items.sort(key=lambda x: x["posted_at"], reverse=True)
+    all_items.sort(key=itemgetter("posted_at"), reverse=True)
     return all_items
 
 @mcp.tool(description="""
 Use when the user asks: 'What does my week look like?' 'What’s coming up?' or 'Help me plan my week'. 
 Returns Canvas planner items in a date range (assignments, quizzes, calendar events) with links and course names. 
 Best for planning; not as curated as get_today_summary.""")
-def get_week_ahead(days_ahead: int = 7, days_back: int = 0, per_page: int = 100):
+async def get_week_ahead(days_ahead: int = 7, days_back: int = 0, per_page: int = 100):
     now = datetime.now(timezone.utc)
-    start = now - timedelta(days=days_back)
-    end = now + timedelta(days=days_ahead)
+    start_iso = (now - timedelta(days=days_back)).isoformat(timespec="seconds").replace("+00:00", "Z")
+    end_iso = (now + timedelta(days=days_ahead)).isoformat(timespec="seconds").replace("+00:00", "Z")
     params = {
         "per_page": per_page,
-        "start_date": start.isoformat().replace("+00:00", "Z"),
-        "end_date": end.isoformat().replace("+00:00", "Z"), 
+        "start_date": start_iso,
+        "end_date": end_iso,
     }
 
-    r = canvas_get("/api/v1/planner/items", params)
+    r = await canvas_get("/api/v1/planner/items", params)
     if not r["ok"]:
         return r
 
     items = r["data"] or []
     #print("planner/items returned:", len(items))
     out: list[dict[str, Any]] = []
+    bu = base_url  # local bind; abs_url inlined below to skip a call frame per item
+    _append = out.append
 
     for item in items:
         dt_raw = item.get("plannable_date")
         if not dt_raw:
             continue
 
-        dt = datetime.fromisoformat(dt_raw.replace("Z", "+00:00"))
-        if not (start <= dt <= end):
+        # ISO UTC strings compare lexicographically; no parse per item
+        if not (start_iso <= dt_raw <= end_iso):
             continue
 
         plannable = item.get("plannable") or {}
         pl_type = item.get("plannable_type")
-
-        normalized: dict[str, Any] = {
-            "type": pl_type,
-            "course_id": item.get("course_id"),
-            "course_name": item.get("context_name"),
-            "id": item.get("plannable_id"),
-            "title": plannable.get("title"),
-            "date": dt.isoformat(),
-            "new_activity": item.get("new_activity", False),
-            "html_url": abs_url(item.get("html_url") or ""),
-        }
-
         subs = item.get("submissions")
-        if isinstance(subs, dict):
-            normalized["submission"] = {
-                "submitted": subs.get("submitted"),
-                "graded": subs.get("graded"),
-                "late": subs.get("late"),
-                "missing": subs.get("missing"),
-                "posted_at": subs.get("posted_at"),
-                "has_feedback": subs.get("has_feedback"),
-            }
-
-        if pl_type in ("assignment", "quiz"):
-            normalized["due_at"] = plannable.get("due_at")
-            normalized["points_possible"] = plannable.get("points_possible")
-            normalized["assignment_id"] = plannable.get("assignment_id")
-
-        if pl_type == "calendar_event":
-            normalized["start_at"] = plannable.get("start_at")
-            normalized["end_at"] = plannable.get("end_at")
-            normalized["location_name"] = plannable.get("location_name")
-            normalized["online_meeting_url"] = plannable.get("online_meeting_url")
+        if not isinstance(subs, dict):
+            subs = None
 
-        out.append(normalized)
-    out.sort(key=lambda x: x["date"])
+        _append(_normalize_planner_item(item, plannable, pl_type, dt_raw, subs, bu))
+    out.sort(key=itemgetter("date"))
     return out
 
 @mcp.tool(description="""
 Use when the user asks: 'Did anything get graded?' 'Any grades posted recently?' or 'Any feedback?' 
 Returns planner items that were graded in the last N days (optionally only those with feedback). 
 Best for grade-checking / notifications.""")
-def get_recently_graded(days_back: int = 7, term_prefix: str | None = None, max_courses: int = 8, per_page : int = 100, include_only_with_feedback: bool = False):
+async def get_recently_graded(days_back: int = 7, term_prefix: str | None = None, max_courses: int = 8, per_page : int = 100, include_only_with_feedback: bool = False):
 
     now = datetime.now(timezone.utc)
-    start = now - timedelta(days=days_back)
-
-    allowed_course_ids: set[int] | None = None
-    if term_prefix is not None or (max_courses and max_courses > 0):
-        courses = fetch_dashboard_cards(term_prefix)
-        if not term_prefix and max_courses and max_courses > 0:
-            courses = courses[:max_courses]
-        allowed_course_ids = {c["id"] for c in courses}
+    start_iso = (now - timedelta(days=days_back)).isoformat(timespec="seconds").replace("+00:00", "Z")
+    now_iso = now.isoformat(timespec="seconds").replace("+00:00", "Z")
 
     params = {
         "per_page": per_page,
-        "start_date": start.isoformat().replace("+00:00", "Z"),
-        "end_date": now.isoformat().replace("+00:00", "Z"),
+        "start_date": start_iso,
+        "end_date": now_iso,
     }
 
-    r = canvas_get("/api/v1/planner/items", params)
+    # the card list and planner feed are independent, so fetch them in parallel
+    allowed_course_ids: frozenset[int] | None = None
+    if term_prefix is not None or (max_courses and max_courses > 0):
+        limit = max_courses if not term_prefix and max_courses and max_courses > 0 else None
+        courses, r = await asyncio.gather(
+            fetch_dashboard_cards(term_prefix, limit=limit),
+            canvas_get("/api/v1/planner/items", params),
+        )
+        allowed_course_ids = _allowed_course_ids(courses)
+    else:
+        r = await canvas_get("/api/v1/planner/items", params)
+
     if not r["ok"]:
         return r
 
     items = r["data"] or []
     out: list[dict[str, Any]] = []
+    bu = base_url
+    allowed = allowed_course_ids  # local bind for the membership check per item
 
     for item in items:
         course_id = item.get("course_id")
-        if allowed_course_ids is not None and course_id not in allowed_course_ids:
+        if allowed is not None and course_id not in allowed:
             continue
 
         subs = item.get("submissions")
@@ -360,43 +586,32 @@ def get_recently_graded(days_back: int = 7, term_prefix: str | None = None, max_
         if not grade_posted_raw:
             continue
 
-        try:
-            grade_posted_at = datetime.fromisoformat(grade_posted_raw.replace("Z", "+00:00"))
-        except Exception:
-            continue
-
-        if not (start <= grade_posted_at <= now):
+        if not (start_iso <= grade_posted_raw <= now_iso):
             continue
 
         plannable = item.get("plannable") or {}
         pl_type = item.get("plannable_type")
+        u = item.get("html_url") or ""
 
         out.append({
             "type": "graded",
-            "plannable_type": pl_type, 
+            "plannable_type": pl_type,
             "course_id": course_id,
             "course_name": item.get("context_name"),
             "id": item.get("plannable_id"),
             "title": plannable.get("title"),
-            "grade_posted_at": grade_posted_at.isoformat(),
-            "html_url": abs_url(item.get("html_url") or ""),
-            "submission": {
-                "submitted": subs.get("submitted"),
-                "graded": subs.get("graded"),
-                "late": subs.get("late"),
-                "missing": subs.get("missing"),
-                "posted_at": subs.get("posted_at"),
-                "has_feedback": subs.get("has_feedback"),
-            },
+            "grade_posted_at": grade_posted_raw,
+            "html_url": bu + u if u and u[0] == "/" else u,
+            "submission": _submission_summary(subs),
         })
 
-    out.sort(key=lambda x: x["grade_posted_at"], reverse=True)
+    out.sort(key=itemgetter("grade_posted_at"), reverse=True)
     return out;
 
 @mcp.tool(description="""
 Use for daily check-ins like: 'What do I need to do today?' 'Anything important on Canvas?' 
 Returns a curated summary window: upcoming deadlines + events, recent announcements, newly graded items, and overdue not-submitted assignments from the last week. Best default tool for general student questions.""")
-def get_today_summary(
+async def get_today_summary(
     future_hours: int = 48,
     past_hours: int = 48,
     term_prefix: str | None = None,
@@ -413,24 +628,49 @@ def get_today_summary(
     days_ahead = max(1, int((future_hours + 23) // 24))
     days_back = max(1, int((past_hours + 23) // 24))
 
-    courses = fetch_dashboard_cards(term_prefix)
-    if not term_prefix and max_courses and max_courses > 0:
-        courses = courses[:max_courses]
-    allowed_course_ids = {c["id"] for c in courses}
-
-    # planner deadlines + events
+    # planner and discussion timestamps are ISO-8601 UTC, so every window gate
+    # below is a lexicographic string compare against these precomputed bounds
+    now_iso = now.isoformat(timespec="seconds").replace("+00:00", "Z")
+    window_start_iso = window_start.isoformat(timespec="seconds").replace("+00:00", "Z")
+    window_end_iso = window_end.isoformat(timespec="seconds").replace("+00:00", "Z")
+
+    limit = max_courses if not term_prefix and max_courses and max_courses > 0 else None
+    courses = await fetch_dashboard_cards(term_prefix, limit=limit)
+    allowed_course_ids = _allowed_course_ids(courses)
+
+    # one planner fetch covers every date-based section: the future deadline/event
+    # window plus the past window for grades and week-old overdue work. That
+    # replaces the old second planner call and the per-course assignments fan-out
+    # (overdue items are recoverable from the planner submissions block).
+    lookback_days = max(days_back, 7)
     planner_params = {
         "per_page": planner_per_page,
-        "start_date": now.isoformat().replace("+00:00", "Z"),
+        "start_date": (now - timedelta(days=lookback_days)).isoformat().replace("+00:00", "Z"),
         "end_date": (now + timedelta(days=days_ahead)).isoformat().replace("+00:00", "Z"),
     }
+    ann_params = {"only_announcements": "true", "per_page": 50}
+
+    r, ann_responses = await asyncio.gather(
+        canvas_get("/api/v1/planner/items", planner_params),
+        asyncio.gather(
+            *[canvas_get(f"/api/v1/courses/{course['id']}/discussion_topics", ann_params) for course in courses],
+            return_exceptions=True,
+        ),
+    )
 
-    r = canvas_get("/api/v1/planner/items", planner_params)
     planner_items = r["data"] if isinstance(r, dict) and r.get("ok") else []
 
     deadlines: list[dict[str, Any]] = []
     events: list[dict[str, Any]] = []
+    graded: list[dict[str, Any]] = []
+    overdue: list[dict[str, Any]] = []
 
+    graded_start_iso = (now - timedelta(days=days_back)).isoformat(timespec="seconds").replace("+00:00", "Z")
+    overdue_cutoff_iso = (now - timedelta(days=7)).isoformat(timespec="seconds").replace("+00:00", "Z")
+
+    # single pass: each planner item lands in deadlines, events, graded and/or
+    # overdue depending on its date and submission state
+    bu = base_url
     for item in planner_items or []:
         course_id = item.get("course_id")
         if course_id not in allowed_course_ids:
@@ -440,99 +680,101 @@ def get_today_summary(
         if not dt_raw:
             continue
 
-        try:
-            dt = datetime.fromisoformat(dt_raw.replace("Z", "+00:00"))
-        except Exception:
-            continue
-
-        if not (now <= dt <= window_end):
-            continue
-
         plannable = item.get("plannable") or {}
         pl_type = item.get("plannable_type")
-
-        normalized: dict[str, Any] = {
-            "type": pl_type,
-            "course_id": course_id,
-            "course_name": item.get("context_name"),
-            "id": item.get("plannable_id"),
-            "title": plannable.get("title"),
-            "date": dt.isoformat(),
-            "new_activity": item.get("new_activity", False),
-            "html_url": abs_url(item.get("html_url") or ""),
-        }
-
         subs = item.get("submissions")
-        if isinstance(subs, dict):
-            normalized["submission"] = {
-                "submitted": subs.get("submitted"),
-                "graded": subs.get("graded"),
-                "late": subs.get("late"),
-                "missing": subs.get("missing"),
-                "posted_at": subs.get("posted_at"),
-                "has_feedback": subs.get("has_feedback"),
-            }
-
-        if pl_type in ("assignment", "quiz"):
-            normalized["due_at"] = plannable.get("due_at")
-            normalized["points_possible"] = plannable.get("points_possible")
-            normalized["assignment_id"] = plannable.get("assignment_id")
-
-        if pl_type == "calendar_event":
-            normalized["start_at"] = plannable.get("start_at")
-            normalized["end_at"] = plannable.get("end_at")
-            normalized["location_name"] = plannable.get("location_name")
-            normalized["online_meeting_url"] = plannable.get("online_meeting_url")
-            events.append(normalized)
-            continue
-
-        if pl_type in ("assignment", "quiz"):
-            sub = normalized.get("submission")
-            if isinstance(sub, dict) and sub.get("submitted") is True:
-                continue
-            deadlines.append(normalized)
-
-    deadlines.sort(key=lambda x: x.get("date", ""))
-    events.sort(key=lambda x: x.get("date", ""))
+        if not isinstance(subs, dict):
+            subs = None
+
+        if now_iso <= dt_raw <= window_end_iso:
+            if pl_type in ("assignment", "quiz"):
+                if not (subs is not None and subs.get("submitted") is True):
+                    deadlines.append(_normalize_planner_item(item, plannable, pl_type, dt_raw, subs, bu))
+
+            elif pl_type == "calendar_event":
+                events.append(_normalize_planner_item(item, plannable, pl_type, dt_raw, subs, bu))
+
+        if dt_raw <= now_iso and subs is not None:
+            # newly graded work from the past window
+            if (
+                graded_start_iso <= dt_raw
+                and subs.get("graded") is True
+                and (not include_only_with_feedback or subs.get("has_feedback") is True)
+            ):
+                grade_posted_raw = subs.get("posted_at") or dt_raw
+                if window_start_iso <= grade_posted_raw <= now_iso:
+                    graded.append({
+                        "type": "graded",
+                        "plannable_type": pl_type,
+                        "course_id": course_id,
+                        "course_name": item.get("context_name"),
+                        "id": item.get("plannable_id"),
+                        "title": plannable.get("title"),
+                        "grade_posted_at": grade_posted_raw,
+                        "html_url": abs_url(item.get("html_url") or ""),
+                        "submission": _submission_summary(subs),
+                    })
+
+            # overdue and not submitted in the last 7 days cuz i be forgetting
+            if (
+                pl_type in ("assignment", "quiz")
+                and overdue_cutoff_iso <= dt_raw
+                and subs.get("submitted") is not True
+            ):
+                overdue.append({
+                    "type": "assignment",
+                    "course_id": course_id,
+                    "course_name": item.get("context_name"),
+                    "id": plannable.get("assignment_id") or item.get("plannable_id"),
+                    "name": plannable.get("title"),
+                    "due_at": plannable.get("due_at") or dt_raw,
+                    "is_overdue": True,
+                    "submitted": False,
+                    "points_possible": plannable.get("points_possible"),
+                    "html_url": abs_url(item.get("html_url") or ""),
+                })
+
+    # the planner feed arrives ordered by plannable_date, and deadlines/events
+    # append in feed order keyed on that same date, so they are already sorted;
+    # graded and overdue re-key on posted_at/due_at and still need their sorts
+    graded.sort(key=itemgetter("grade_posted_at"), reverse=True)
+    overdue.sort(key=itemgetter("due_at"), reverse=True)
 
     # past hour announcements
     announcements: list[dict[str, Any]] = []
 
-    for course in courses:
+    for course, rr in zip(courses, ann_responses):
         course_id = course["id"]
         course_name = course["name"]
 
-        params = {"only_announcements": "true", "per_page": 50}
-        rr = canvas_get(f"/api/v1/courses/{course_id}/discussion_topics", params)
         if not (isinstance(rr, dict) and rr.get("ok")):
             continue
 
         topics = rr["data"] or []
-        per_course_bucket: list[dict[str, Any]] = []
 
+        # same deferral as _fetch_announcements_for_course: pick the newest topics
+        # first so strip_html only ever runs on the ones actually returned
+        candidates: list[tuple[str, dict]] = []
         for topic in topics:
             posted_raw = topic.get("posted_at") or topic.get("created_at")
             if not posted_raw:
                 continue
 
-            try:
-                posted = datetime.fromisoformat(posted_raw.replace("Z", "+00:00"))
-            except Exception:
+            # the old days_back gate is subsumed: days_back rounds past_hours up,
+            # so window_start is always the tighter lower bound
+            if not (window_start_iso <= posted_raw <= now_iso):
                 continue
 
-            if posted < (now - timedelta(days=days_back)):
-                continue
-
-            if not (window_start <= posted <= now):
-                continue
+            candidates.append((posted_raw, topic))
 
+        for posted_raw, topic in heapq.nlargest(per_course_announcements, candidates, key=itemgetter(0)):
             item: dict[str, Any] = {
                 "type": "announcement",
                 "course_id": course_id,
                 "course_name": course_name,
                 "id": topic.get("id"),
                 "title": topic.get("title"),
-                "posted_at": posted.isoformat(),
+                "posted_at": posted_raw,
                 "author": (topic.get("author") or {}).get("display_name") or topic.get("user_name"),
                 "read_state": topic.get("read_state"),
                 "unread_count": topic.get("unread_count"),
@@ -544,107 +786,9 @@ def get_today_summary(
                 item["message_html"] = body_html
                 item["message_text"] = strip_html(body_html) if body_html else ""
 
-            per_course_bucket.append(item)
-
-        per_course_bucket.sort(key=lambda x: x.get("posted_at", ""), reverse=True)
-        announcements.extend(per_course_bucket[:per_course_announcements])
-
-    announcements.sort(key=lambda x: x.get("posted_at", ""), reverse=True)
-
-    # graded items 
-    graded: list[dict[str, Any]] = []
-
-    graded_params = {
-        "per_page": planner_per_page,
-        "start_date": (now - timedelta(days=days_back)).isoformat().replace("+00:00", "Z"),
-        "end_date": now.isoformat().replace("+00:00", "Z"),
-    }
-    rr = canvas_get("/api/v1/planner/items", graded_params)
-    graded_items = rr["data"] if isinstance(rr, dict) and rr.get("ok") else []
-
-    for item in graded_items or []:
-        course_id = item.get("course_id")
-        if course_id not in allowed_course_ids:
-            continue
-
-        subs = item.get("submissions")
-        if not isinstance(subs, dict):
-            continue
-        if subs.get("graded") is not True:
-            continue
-        if include_only_with_feedback and subs.get("has_feedback") is not True:
-            continue
-
-        grade_posted_raw = subs.get("posted_at") or item.get("plannable_date")
-        if not grade_posted_raw:
-            continue
-
-        try:
-            grade_posted_at = datetime.fromisoformat(grade_posted_raw.replace("Z", "+00:00"))
-        except Exception:
-            continue
-
-        if not (window_start <= grade_posted_at <= now):
-            continue
-
-        plannable = item.get("plannable") or {}
-        pl_type = item.get("plannable_type")
-
-        graded.append({
-            "type": "graded",
-            "plannable_type": pl_type,
-            "course_id": course_id,
-            "course_name": item.get("context_name"),
-            "id": item.get("plannable_id"),
-            "title": plannable.get("title"),
-            "grade_posted_at": grade_posted_at.isoformat(),
-            "html_url": abs_url(item.get("html_url") or ""),
-            "submission": {
-                "submitted": subs.get("submitted"),
-                "graded": subs.get("graded"),
-                "late": subs.get("late"),
-                "missing": subs.get("missing"),
-                "posted_at": subs.get("posted_at"),
-                "has_feedback": subs.get("has_feedback"),
-            },
-        })
-
-    graded.sort(key=lambda x: x.get("grade_posted_at", ""), reverse=True)
-
-    # overdue and not submitted assignments in the last 7 days cuz i be forgetting
-    overdue: list[dict[str, Any]] = []
-    overdue_cutoff = now - timedelta(days=7)
-
-    for course in courses:
-        course_id = course["id"]
-        course_name = course["name"]
-
-        items = fetch_assignments(course_id, days_ahead = 0, include_overdue = True)
-        if not isinstance(items, list):
-            continue
-
-        for a in items:
-            if a.get("is_overdue") is not True:
-                continue
-            if a.get("submitted") is True:
-                continue
-
-            due_raw = a.get("due_at")
-            if not due_raw:
-                continue
-
-            try:
-                due = datetime.fromisoformat(due_raw.replace("Z", "+00:00"))
-            except Exception:
-                continue
-
-            if not (overdue_cutoff <= due <= now):
-                continue
-
-            a["course_name"] = course_name
-            overdue.append(a)
-    overdue.sort(key=lambda x: x.get("due_at", ""), reverse=True)
+            announcements.append(item)
 
+    announcements.sort(key=itemgetter("posted_at"), reverse=True)
 
     return {
         "generated_at": now.isoformat(),
@@ -682,8 +826,8 @@ def resource_term_prefix():
     "canvas://courses/dashboard/{term_prefix}",
     description="Dashboard courses filtered by term prefix like '26SS' or '26FS'.",
 )
-def resource_dashboard_courses_by_term(term_prefix: str):
-    return fetch_dashboard_cards(term_prefix=term_prefix)
+async def resource_dashboard_courses_by_term(term_prefix: str):
+    return await fetch_dashboard_cards(term_prefix=term_prefix)
 
 @mcp.resource(
     "canvas://help",